@@ -1,32 +1,41 @@
+import re
 import sys
 
+# Only quotes and line breaks change state; re.finditer skips everything else in C
+SIGNIFICANT = re.compile(rb"['\"\n]")
+
 def check_quotes(filename):
-    with open(filename, 'r') as f:
-        lines = f.readlines()
+    with open(filename, 'rb') as f:
+        data = f.read()
 
     in_double_quote = False
     in_single_quote = False
-    
-    for i, line in enumerate(lines):
-        j = 0
-        while j < len(line):
-            char = line[j]
-            
-            if char == "'" and not in_double_quote:
-                in_single_quote = not in_single_quote
-            elif char == '"' and not in_single_quote:
-                # Check for escaped quote
-                if j > 0 and line[j-1] == '\\':
-                    pass
-                else:
-                    in_double_quote = not in_double_quote
-            
-            j += 1
-            
+    line_start = 0
+    line_no = 1
+
+    def report(end):
         if in_double_quote:
-            print(f"Line {i+1} ends inside double quote: {line.strip()}")
-        if in_single_quote:
-            # Single quotes can span lines in bash
-            pass
+            line = data[line_start:end].decode('utf-8', errors='replace')
+            print(f"Line {line_no} ends inside double quote: {line.strip()}")
+        # Single quotes can span lines in bash
+
+    for match in SIGNIFICANT.finditer(data):
+        pos = match.start()
+        char = data[pos]
+
+        if char == 0x0A:  # '\n'
+            report(pos + 1)
+            line_start = pos + 1
+            line_no += 1
+        elif char == 0x27:  # "'"
+            if not in_double_quote:
+                in_single_quote = not in_single_quote
+        elif not in_single_quote:  # '"'
+            # Check for escaped quote
+            if pos <= line_start or data[pos - 1] != 0x5C:  # '\\'
+                in_double_quote = not in_double_quote
+
+    if line_start < len(data):
+        report(len(data))
 
 check_quotes("get_bundle.sh")
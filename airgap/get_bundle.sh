@@ -26,6 +26,15 @@ debug_log() {
   # #endregion
 }
 
+# Run one of the Python helpers in scripts/ as a module of the airgap package.
+# The package name is the checkout directory itself (PYTHONPATH is its parent),
+# so this only works while the directory containing get_bundle.sh is named airgap.
+run_script() {
+  local module="$1"
+  shift
+  PYTHONPATH="$(dirname "$SCRIPT_DIR")${PYTHONPATH:+:$PYTHONPATH}" python3 -m "airgap.scripts.$module" "$@"
+}
+
 # #region agent log
 dm_log() {
   local location="$1"
@@ -292,6 +301,20 @@ else
 fi
 log ""
 
+# The download helpers in scripts/ use urllib3 for pooled keep-alive connections
+if ! python3 -c "import urllib3" >/dev/null 2>&1; then
+  log "urllib3 not found for python3. Trying apt-get install python3-urllib3 (requires sudo)..."
+  if ! sudo apt-get install -y python3-urllib3 >/dev/null 2>&1 || ! python3 -c "import urllib3" >/dev/null 2>&1; then
+    log "ERROR: python3 urllib3 module is required by the download scripts."
+    log "  Install it with: sudo apt-get install -y python3-urllib3"
+    log "  Or: python3 -m pip install --user urllib3"
+    # #region agent log
+    debug_log "get_bundle.sh:urllib3_check" "urllib3 unavailable" "{\"status\":\"failed\"}" "INIT-E" "run1"
+    # #endregion
+    exit 1
+  fi
+fi
+
 # Set up console logging - redirect stdout and stderr to both console and log file
 # This ensures all output goes to both screen and log file
 # Note: This must be after BUNDLE_DIR is set and log directory is created
@@ -499,6 +522,25 @@ sha256_check_vsix() {
   fi
 }
 
+# ============
+# 0) Prefetch independent downloads in parallel
+# ============
+# Fetches Ollama, VSCodium, the Open VSX extensions and rustup-init concurrently
+# in one process. Components that already exist are skipped here; the sections
+# below verify every artifact and fall back to per-component downloads.
+log "Prefetching downloads in parallel..."
+# #region agent log
+debug_log "get_bundle.sh:prefetch:start" "Starting parallel prefetch" "{\"bundle_dir\":\"$BUNDLE_DIR\"}" "PREFETCH-A" "run1"
+# #endregion
+PREFETCH_STATUS=0
+DEBUG_LOG="$DEBUG_LOG" run_script download_all "$BUNDLE_DIR" || PREFETCH_STATUS=$?
+if [[ $PREFETCH_STATUS -ne 0 ]]; then
+  log "WARNING: Some parallel downloads failed. They will be retried individually below."
+fi
+# #region agent log
+debug_log "get_bundle.sh:prefetch:complete" "Parallel prefetch completed" "{\"exit_code\":$PREFETCH_STATUS}" "PREFETCH-A" "run1"
+# #endregion
+
 # ============
 # 1) Ollama (Linux amd64) + official SHA256 from GitHub Releases
 # ============
@@ -514,6 +556,13 @@ if [[ -f "$OLLAMA_ARCHIVE" ]]; then
   OLLAMA_EXISTING="$OLLAMA_ARCHIVE"
 elif [[ -f "$OLLAMA_TGZ" ]]; then
   OLLAMA_EXISTING="$OLLAMA_TGZ"
+else
+  # The prefetch may have picked another linux-amd64 asset (see download_ollama.rank)
+  OLLAMA_EXISTING=$(find "$BUNDLE_DIR/ollama" -maxdepth 1 -name "ollama-linux-amd64*" -type f ! -name "*.sha256" ! -name "*.verified" 2>/dev/null | head -n1)
+fi
+# The SHA file sits next to whichever archive exists (the prefetch writes the official hash there)
+if [[ -n "$OLLAMA_EXISTING" ]]; then
+  OLLAMA_SHA="${OLLAMA_EXISTING}.sha256"
 fi
 
 # #region agent log
@@ -576,7 +625,7 @@ if [[ $OLLAMA_DL_STATUS -ne 0 ]]; then
   debug_log "get_bundle.sh:ollama:download_start" "Starting Ollama download" "{\"bundle_dir\":\"$BUNDLE_DIR\"}" "OLLAMA-C" "run1"
   # #endregion
   
-  python3 "$SCRIPT_DIR/scripts/download_ollama.py" "$BUNDLE_DIR"
+  run_script download_ollama "$BUNDLE_DIR"
   OLLAMA_DL_STATUS=$?
   
   # Find the actual downloaded file (could be .tar.zst or .tgz)
@@ -1327,7 +1376,7 @@ if [[ $VSCODIUM_DL_STATUS -ne 0 ]]; then
   debug_log "get_bundle.sh:vscodium:download_start" "Starting VSCodium download" "{\"bundle_dir\":\"$BUNDLE_DIR\"}" "VSCODIUM-A" "run1"
   # #endregion
   
-  python3 "$SCRIPT_DIR/scripts/download_vscodium.py" "$BUNDLE_DIR"
+  run_script download_vscodium "$BUNDLE_DIR"
   VSCODIUM_DL_STATUS=$?
   
   # #region agent log
@@ -1414,7 +1463,7 @@ if [[ "$CONTINUE_DL_STATUS" -ne 0 ]]; then
   debug_log "get_bundle.sh:continue:download_start" "Starting Continue VSIX download" "{\"bundle_dir\":\"$BUNDLE_DIR\"}" "CONTINUE-A" "run1"
   # #endregion
   
-  DEBUG_LOG="$DEBUG_LOG" python3 "$SCRIPT_DIR/scripts/download_extension.py" "$BUNDLE_DIR" "Continue/continue" "continue"
+  DEBUG_LOG="$DEBUG_LOG" run_script download_extension "$BUNDLE_DIR" "Continue/continue" "continue"
   CONTINUE_DL_STATUS=$?
   
   # #region agent log
@@ -1525,7 +1574,7 @@ if [[ $PYTHON_EXT_DL_STATUS -ne 0 ]]; then
   debug_log "get_bundle.sh:python_ext:download_start" "Starting Python extension VSIX download" "{\"bundle_dir\":\"$BUNDLE_DIR\"}" "PYTHON-EXT-A" "run1"
   # #endregion
   
-  python3 "$SCRIPT_DIR/scripts/download_extension.py" "$BUNDLE_DIR" "ms-python/python" "extensions"
+  run_script download_extension "$BUNDLE_DIR" "ms-python/python" "extensions"
   PYTHON_EXT_DL_STATUS=$?
   
   # #region agent log
@@ -1636,7 +1685,7 @@ if [[ $RUST_EXT_DL_STATUS -ne 0 ]]; then
   debug_log "get_bundle.sh:rust_ext:download_start" "Starting Rust extension VSIX download" "{\"bundle_dir\":\"$BUNDLE_DIR\"}" "RUST-EXT-A" "run1"
   # #endregion
   
-  python3 "$SCRIPT_DIR/scripts/download_extension.py" "$BUNDLE_DIR" "rust-lang/rust-analyzer" "extensions"
+  run_script download_extension "$BUNDLE_DIR" "rust-lang/rust-analyzer" "extensions"
   RUST_EXT_DL_STATUS=$?
   
   # #region agent log
@@ -2145,6 +2194,8 @@ debug_log "get_bundle.sh:rust_toolchain:check" "Checking for existing Rust toolc
 if [[ -f "$RUSTUP_INIT" ]] && [[ -x "$RUSTUP_INIT" ]]; then
   RUSTUP_SIZE=$(du -sh "$RUSTUP_INIT" 2>/dev/null | cut -f1 || echo "unknown")
   log "Rust toolchain installer already exists ($RUSTUP_SIZE). Skipping download."
+  # install_offline.sh reads rust/rustup-init; the prefetch only fills rust/toolchain/
+  cp "$RUSTUP_INIT" "$BUNDLE_DIR/rust/rustup-init" 2>/dev/null || true
   mark_success "rust_toolchain"
   RUST_TOOLCHAIN_EXISTS=true
   # #region agent log
@@ -2158,7 +2209,7 @@ else
   debug_log "get_bundle.sh:rust_toolchain:download_start" "Starting Rust toolchain download" "{\"bundle_dir\":\"$BUNDLE_DIR\"}" "RUST-TOOLCHAIN-B" "run1"
   # #endregion
   
-  python3 "$SCRIPT_DIR/scripts/download_rust_toolchain.py" "$BUNDLE_DIR"
+  run_script download_rust_toolchain "$BUNDLE_DIR"
   # Verify rustup-init was downloaded
   if [[ -f "$BUNDLE_DIR/rust/toolchain/rustup-init" ]]; then
     # Also create a symlink/copy in the rust directory for easy access
@@ -2439,11 +2490,11 @@ if [[ -f "$PYTHON_REQUIREMENTS" ]]; then
       # #endregion agent log
     fi
     
-    python3 "$SCRIPT_DIR/scripts/download_python_packages.py" "$BUNDLE_DIR" "$PYTHON_REQUIREMENTS"
+    run_script download_python_packages "$BUNDLE_DIR" "$PYTHON_REQUIREMENTS"
     
     # Check if site-packages has content
     if [[ -d "$BUNDLE_DIR/python/site-packages" ]] && [[ -n "$(ls -A "$BUNDLE_DIR/python/site-packages")" ]]; then
-      PYTHON_PKG_COUNT=$(find "$BUNDLE_DIR/python/site-packages" -maxdepth 1 -name "*-info" 2>/dev/null | wc -l)
+      PYTHON_PKG_COUNT=$(find "$BUNDLE_DIR/python/site-packages" -maxdepth 1 \( -name "*.dist-info" -o -name "*.egg-info" \) 2>/dev/null | wc -l)
       log "Python packages installed successfully."
       mark_success "python_packages"
       # #region agent log
@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from airgap.scripts.utils import MAX_CONNECTIONS
+from airgap.scripts import download_ollama, download_vscodium, download_extension, download_rust_toolchain
+
+# Prefetch all independent downloads for the bundle in one process so they
+# overlap on the network and share utils' keep-alive connection pool.
+# Components whose artifacts already exist are left to get_bundle.sh, which
+# verifies them and re-downloads via the per-component scripts if needed.
+
+def has_any(directory, pattern):
+    return any(p for p in directory.glob(pattern) if not p.name.endswith((".sha256", ".verified")))
+
+def plan(bundle):
+    """Return [(component, directory, pattern, job), ...]; a job is skipped if pattern matches in directory."""
+    return [
+        ("ollama_linux", bundle/"ollama", "ollama-linux-amd64*",
+         lambda: download_ollama.main(bundle)),
+        ("vscodium", bundle/"vscodium", "*_amd64.deb",
+         lambda: download_vscodium.main(bundle)),
+        ("continue", bundle/"continue", "Continue.continue-*.vsix",
+         lambda: download_extension.main(bundle, "Continue/continue", "continue")),
+        ("python_ext", bundle/"extensions", "ms-python.python-*.vsix",
+         lambda: download_extension.main(bundle, "ms-python/python", "extensions")),
+        ("rust_ext", bundle/"extensions", "rust-lang.rust-analyzer-*.vsix",
+         lambda: download_extension.main(bundle, "rust-lang/rust-analyzer", "extensions")),
+        ("rust_toolchain", bundle/"rust"/"toolchain", "rustup-init",
+         lambda: download_rust_toolchain.main(bundle)),
+    ]
+
+def run_job(job):
+    try:
+        job()
+    except SystemExit as e:
+        return e.code or 0
+    except Exception as e:
+        print(f"ERROR: Unexpected error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def main(bundle, workers=MAX_CONNECTIONS):
+    jobs = []
+    for component, directory, pattern, job in plan(bundle):
+        if has_any(directory, pattern):
+            print(f"{component}: already present, leaving verification to get_bundle.sh")
+        else:
+            jobs.append((component, job))
+
+    if not jobs:
+        print("Nothing to prefetch.")
+        return 0
+
+    print(f"Prefetching {len(jobs)} components in parallel: {', '.join(c for c, _ in jobs)}")
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        results = list(executor.map(run_job, [job for _, job in jobs]))
+
+    failed = [component for (component, _), code in zip(jobs, results) if code]
+    for component in failed:
+        print(f"WARNING: Prefetch failed for {component}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m airgap.scripts.download_all <bundle_dir>")
+        sys.exit(1)
+    sys.exit(main(Path(sys.argv[1])))
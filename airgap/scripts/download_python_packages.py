@@ -2,7 +2,7 @@ import sys, subprocess, shutil, os
 from pathlib import Path
 
 if len(sys.argv) < 3:
-    print("Usage: python3 download_python_packages.py <bundle_dir> <requirements_file>")
+    print("Usage: python3 -m airgap.scripts.download_python_packages <bundle_dir> <requirements_file>")
     sys.exit(1)
 
 bundle = Path(sys.argv[1])
@@ -21,20 +21,35 @@ print(f"Installing Python packages to {outdir}...")
 print("This ensures all dependencies are resolved and installed for the target system.")
 
 try:
-    # pip install --target installs everything into the directory
-    # We use --ignore-installed to ensure we get a fresh copy of everything
     # We use --no-compile to avoid .pyc files which might be python-version specific
-    cmd = [
-        sys.executable, "-m", "pip", "install",
-        "-r", str(requirements),
-        "--target", str(outdir),
-        "--upgrade",
-        "--no-compile",
-        "--ignore-installed"
-    ]
+    env = None
+    uv = shutil.which("uv")
+    if uv:
+        # uv resolves and downloads in parallel and reuses its wheel cache.
+        # outdir was just recreated, so pip's --ignore-installed/--upgrade are not needed.
+        # --python pins resolution to the same interpreter pip would have used.
+        cmd = [
+            uv, "pip", "install",
+            "-r", str(requirements),
+            "--target", str(outdir),
+            "--python", sys.executable,
+            "--no-compile"
+        ]
+        env = dict(os.environ, UV_CONCURRENT_DOWNLOADS="16")
+    else:
+        # pip install --target installs everything into the directory
+        # We use --ignore-installed to ensure we get a fresh copy of everything
+        cmd = [
+            sys.executable, "-m", "pip", "install",
+            "-r", str(requirements),
+            "--target", str(outdir),
+            "--upgrade",
+            "--no-compile",
+            "--ignore-installed"
+        ]
     
     print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env)
     
     if result.returncode != 0:
         print(f"Error installing packages:")
@@ -47,7 +62,7 @@ try:
         print(result.stdout)
     
     # Count installed packages (top-level directories/egg-infos)
-    pkg_count = len(list(outdir.glob("*-info")))
+    pkg_count = sum(1 for e in os.scandir(outdir) if e.name.endswith((".dist-info", ".egg-info")))
     print(f"✓ Installed approximately {pkg_count} packages to bundle")
     
 except Exception as e:
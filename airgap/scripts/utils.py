@@ -1,5 +1,7 @@
-import urllib.request
-import urllib.error
+import urllib3
+import shutil
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 import time
 import os
 import sys
@@ -8,8 +10,46 @@ from datetime import datetime
 
 # Debug configuration
 DEBUG_LOG_PATH = os.environ.get("DEBUG_LOG", "debug_trace.log")
+# Tracing is opt-in; when enabled, entries are buffered and written once at exit
+_DEBUG = os.environ.get("DEBUG_LOG_ENABLE") == "1"
+_LOG_BUF = []
+
+USER_AGENT = "get_bundle.sh/1.0"
+CHUNK_SIZE = 1 << 20  # 1MB copy buffer for downloads
+MAX_CONNECTIONS = 16  # Per-host keep-alive connections, sized for the download_all.py fan-out
+
+# Shared connection pool: repeated requests to the same host (open-vsx.org,
+# api.github.com, the GitHub release CDN) reuse the keep-alive socket instead
+# of paying a fresh TCP + TLS handshake per call. maxsize matches the number
+# of concurrent downloads so parallel workers don't open and then discard
+# surplus connections.
+_POOL = urllib3.PoolManager(num_pools=8, maxsize=MAX_CONNECTIONS, headers={"User-Agent": USER_AGENT})
+
+# Exceptions callers should treat as network failures
+NETWORK_ERRORS = (urllib3.exceptions.HTTPError, TimeoutError, OSError)
+
+def _flush_debug_log():
+    if not _LOG_BUF:
+        return
+    try:
+        # #region agent log
+        log_dir = os.path.dirname(DEBUG_LOG_PATH)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+        with open(DEBUG_LOG_PATH, "a") as f:
+            f.write("\n".join(_LOG_BUF) + "\n")
+        # #endregion
+    except Exception:
+        pass
+    _LOG_BUF.clear()
+
+if _DEBUG:
+    atexit.register(_flush_debug_log)
 
 def log_debug(location, message, data, hypothesis_id="GENERAL"):
+    if not _DEBUG:
+        return
     try:
         timestamp = int(time.time() * 1000)
         log_entry = {
@@ -22,64 +62,155 @@ def log_debug(location, message, data, hypothesis_id="GENERAL"):
             "runId": "run1",
             "hypothesisId": hypothesis_id
         }
-        # #region agent log
-        log_dir = os.path.dirname(DEBUG_LOG_PATH)
-        if log_dir and not os.path.exists(log_dir):
-            os.makedirs(log_dir, exist_ok=True)
-            
-        with open(DEBUG_LOG_PATH, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
-        # #endregion
+        _LOG_BUF.append(json.dumps(log_entry))
     except Exception:
         pass
 
-def urlopen_with_retry(url, max_retries=3, timeout=30):
+class HTTPStatusError(IOError):
+    """HTTP error status left after urllib3 has used up its status retries."""
+
+def _retries(max_retries):
+    """Connection/status retry policy.
+
+    429/502/503/504 are retried, honouring the server's Retry-After header
+    (Open VSX sends one when rate limiting) and falling back to exponential
+    backoff. raise_on_status=False hands the final response back so _request
+    can report the actual status code.
+    """
+    return urllib3.Retry(
+        total=None,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        other=max_retries,
+        redirect=10,
+        backoff_factor=1.0,
+        status_forcelist=[429, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+def _request(url, max_retries, timeout, headers=None, **kwargs):
+    """Issue a streaming GET on the shared pool, raising IOError on HTTP error status."""
+    response = _POOL.request(
+        "GET", url,
+        headers={"User-Agent": USER_AGENT, **(headers or {})},
+        preload_content=False,
+        retries=_retries(max_retries),
+        timeout=urllib3.Timeout(connect=10, read=timeout),
+        **kwargs
+    )
+    if response.status >= 400:
+        response.drain_conn()
+        response.release_conn()
+        raise HTTPStatusError(f"HTTP Error {response.status}: {response.reason}")
+    return response
+
+def urlopen_with_retry(url, max_retries=3, timeout=30, headers=None):
     """Open URL with retry logic and timeout."""
     log_debug("scripts/utils.py:urlopen_with_retry", "Function entry", {"url": url, "max_retries": max_retries}, "Hypothesis1")
-    for attempt in range(1, max_retries + 1):
-        try:
-            request = urllib.request.Request(url)
-            request.add_header('User-Agent', 'get_bundle.sh/1.0')
-            log_debug("scripts/utils.py:urlopen_with_retry", "Attempting connection", {"attempt": attempt, "url": url}, "Hypothesis1")
-            response = urllib.request.urlopen(request, timeout=timeout)
-            log_debug("scripts/utils.py:urlopen_with_retry", "Connection successful", {"code": response.getcode(), "url": url}, "Hypothesis1")
-            return response
-        except (urllib.error.URLError, TimeoutError, OSError) as e:
-            error_msg = str(e)
-            log_debug("scripts/utils.py:urlopen_with_retry", "Connection failed", {"attempt": attempt, "error": error_msg}, "Hypothesis1")
-            if attempt < max_retries:
-                wait_time = 2 ** attempt  # Exponential backoff
-                print(f"Attempt {attempt} failed: {error_msg}. Retrying in {wait_time} seconds...")
-                print(f"  URL: {url}")
-                time.sleep(wait_time)
-            else:
-                print(f"ERROR: All {max_retries} attempts failed for URL: {url}")
-                print(f"ERROR: Last error: {error_msg}")
-                raise
+    try:
+        response = _request(url, max_retries, timeout, headers=headers)
+        log_debug("scripts/utils.py:urlopen_with_retry", "Connection successful", {"code": response.status, "url": url}, "Hypothesis1")
+        return response
+    except NETWORK_ERRORS as e:
+        error_msg = str(e)
+        log_debug("scripts/utils.py:urlopen_with_retry", "Connection failed", {"error": error_msg}, "Hypothesis1")
+        print(f"ERROR: Request failed for URL {url}: {error_msg}")
+        raise
+
+def cached_json(url, cache_path, max_retries=3, timeout=30):
+    """Fetch and parse JSON, revalidating a cached copy with If-None-Match.
+
+    The body is kept at cache_path and its ETag at cache_path + ".etag". When
+    the server answers 304 Not Modified the cached body is used, so re-runs
+    skip transferring large API payloads such as GitHub release listings.
+    """
+    cache_path = str(cache_path)
+    etag_path = cache_path + ".etag"
+    headers = {}
+    if os.path.exists(cache_path) and os.path.exists(etag_path):
+        with open(etag_path, encoding="utf-8") as f:
+            headers["If-None-Match"] = f.read().strip()
+
+    with urlopen_with_retry(url, max_retries, timeout, headers=headers) as response:
+        if response.status == 304:
+            response.drain_conn()
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    data = json.load(f)
+                log_debug("scripts/utils.py:cached_json", "Cache hit", {"url": url, "cache_path": cache_path}, "Hypothesis1")
+                print(f"Not modified since last run, using cached response: {cache_path}")
+                return data
+            except (OSError, ValueError):
+                # Unreadable cache: drop the ETag and fetch the full body
+                os.remove(etag_path)
+                return cached_json(url, cache_path, max_retries, timeout)
+        body = response.read().decode("utf-8")
+        etag = response.headers.get("ETag")
 
-def urlretrieve_with_retry(url, filename, max_retries=3, timeout=120):
-    """Download file with retry logic, timeout, and integrity verification."""
+    data = json.loads(body)
+    log_debug("scripts/utils.py:cached_json", "Cache miss", {"url": url, "size": len(body), "etag": etag}, "Hypothesis1")
+    try:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(body)
+        if etag:
+            with open(etag_path, "w", encoding="utf-8") as f:
+                f.write(etag)
+        elif os.path.exists(etag_path):
+            os.remove(etag_path)
+    except OSError:
+        pass
+    return data
+
+class _HashingWriter:
+    """File wrapper that feeds every written chunk to a hashlib object."""
+    def __init__(self, f, hasher):
+        self.f = f
+        self.hasher = hasher
+
+    def write(self, chunk):
+        self.hasher.update(chunk)
+        return self.f.write(chunk)
+
+def urlretrieve_with_retry(url, filename, max_retries=3, timeout=120, hasher=None, verify=False):
+    """Download file with retry logic, timeout, and integrity verification.
+
+    If hasher (e.g. hashlib.sha256()) is given, the bytes are hashed as they
+    are written and the hasher for the successful attempt is returned, so the
+    file never has to be read back just to compute its digest.
+
+    .vsix/.zip downloads are checked by parsing the ZIP central directory,
+    which is enough to reject an HTML error page; verify=True additionally
+    CRC-checks every member (a full extra read of the file).
+
+    Bytes are streamed to a hidden temporary file next to filename and only
+    renamed into place once every check passes, so filename never holds a
+    truncated or invalid download.
+    """
     log_debug("scripts/utils.py:urlretrieve_with_retry", "Function entry", {"url": url, "filename": filename}, "Hypothesis1")
+    # Connection and status retries happen inside urllib3.Retry; this loop only
+    # re-fetches when the body itself is truncated or fails validation.
+    directory, basename = os.path.split(filename)
+    partial = os.path.join(directory, f".{basename}.part")
     for attempt in range(1, max_retries + 1):
+        # Fresh copy per attempt so bytes from a failed attempt are not hashed
+        attempt_hasher = hasher.copy() if hasher is not None else None
         try:
-            request = urllib.request.Request(url)
-            request.add_header('User-Agent', 'get_bundle.sh/1.0')
-            with urllib.request.urlopen(request, timeout=timeout) as response:
+            with _request(url, max_retries, timeout, decode_content=False) as response:
                 # Get expected file size from Content-Length header if available
                 expected_size = response.headers.get('Content-Length')
                 log_debug("scripts/utils.py:urlretrieve_with_retry", "Got headers", {"content_length": expected_size}, "Hypothesis2")
                 if expected_size:
                     expected_size = int(expected_size)
                 
-                # Download file in chunks to handle large files
-                downloaded_size = 0
-                with open(filename, 'wb') as f:
-                    while True:
-                        chunk = response.read(8192)  # 8KB chunks
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
+                # Stream to disk in large chunks to handle large files
+                with open(partial, 'wb') as f:
+                    dest = _HashingWriter(f, attempt_hasher) if attempt_hasher is not None else f
+                    shutil.copyfileobj(response, dest, length=CHUNK_SIZE)
+                    downloaded_size = f.tell()
+                response.release_conn()
                 
                 log_debug("scripts/utils.py:urlretrieve_with_retry", "Download complete", {"downloaded_size": downloaded_size, "expected_size": expected_size}, "Hypothesis2")
 
@@ -95,16 +226,25 @@ def urlretrieve_with_retry(url, filename, max_retries=3, timeout=120):
                 if filename.endswith('.vsix') or filename.endswith('.zip'):
                     import zipfile
                     try:
-                        with zipfile.ZipFile(filename, 'r') as zf:
-                            # Try to read the central directory to verify ZIP integrity
-                            zf.testzip()
+                        with zipfile.ZipFile(partial, 'r') as zf:
+                            # Opening parses the central directory; BadZipFile if missing/corrupt
+                            zf.namelist()
+                            if verify and zf.testzip() is not None:
+                                raise zipfile.BadZipFile("CRC check failed")
                         log_debug("scripts/utils.py:urlretrieve_with_retry", "Zip verification passed", {"filename": filename}, "Hypothesis1")
                     except zipfile.BadZipFile:
                         log_debug("scripts/utils.py:urlretrieve_with_retry", "Zip verification failed", {"filename": filename}, "Hypothesis1")
                         raise IOError(f"Downloaded file is not a valid ZIP archive: {filename}")
                 
-                return
-        except (urllib.error.URLError, TimeoutError, OSError, IOError) as e:
+                os.replace(partial, filename)
+                return attempt_hasher
+        except (urllib3.exceptions.MaxRetryError, HTTPStatusError) as e:
+            # urllib3 already exhausted its connection/status retries
+            log_debug("scripts/utils.py:urlretrieve_with_retry", "Download error", {"error": str(e), "attempt": attempt}, "Hypothesis1")
+            # (or the server answered with a non-retryable status such as 404)
+            print(f"ERROR: Download failed for URL {url}: {e}")
+            raise
+        except NETWORK_ERRORS as e:
             error_msg = str(e)
             log_debug("scripts/utils.py:urlretrieve_with_retry", "Download error", {"error": error_msg, "attempt": attempt}, "Hypothesis1")
             if attempt < max_retries:
@@ -112,9 +252,30 @@ def urlretrieve_with_retry(url, filename, max_retries=3, timeout=120):
                 print(f"Download attempt {attempt} failed: {error_msg}. Retrying in {wait_time} seconds...")
                 print(f"  URL: {url}")
                 time.sleep(wait_time)
-                if os.path.exists(filename):
-                    os.remove(filename)
             else:
                 print(f"ERROR: All {max_retries} download attempts failed for URL: {url}")
                 print(f"ERROR: Last error: {error_msg}")
                 raise
+        finally:
+            # Left behind only by a failed attempt; a good download was renamed
+            if os.path.exists(partial):
+                os.remove(partial)
+
+def download_many(pairs, workers=MAX_CONNECTIONS, **kwargs):
+    """Download [(url, filename), ...] concurrently.
+
+    A pair may carry a third element, a dict of per-download keyword arguments
+    (e.g. {"hasher": hashlib.sha256()}) merged over kwargs. Returns one result
+    per pair, in order: the exception if that download failed, otherwise the
+    return value of urlretrieve_with_retry.
+    """
+    def fetch(pair):
+        url, filename = pair[:2]
+        options = dict(kwargs, **(pair[2] if len(pair) > 2 else {}))
+        try:
+            return urlretrieve_with_retry(url, filename, **options)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pairs)))) as executor:
+        return list(executor.map(fetch, pairs))